@@ -1,13 +1,22 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Set, Tuple
 import re
-from transformers import pipeline
+import ahocorasick
+
+try:
+    # Optional: RE2 gives linear-time matching on very large release notes.
+    # The patterns below are ASCII-only, so they stay on RE2's fast path.
+    import re2 as _regex
+except ImportError:
+    _regex = re
+
+# Precompiled patterns, shared across analyzer instances. Matching runs
+# against the cached lowercase copy of each note, so the pattern is written
+# lowercase and skips IGNORECASE's per-character casefolding.
+_VERSION_RE = _regex.compile(r"requires\s+jira\s+(\d+\.\d+\.\d+)")
 
 
 class ReleaseNotesAnalyzer:
     def __init__(self):
-        # Initialize the sentiment analysis pipeline for importance classification
-        self.classifier = pipeline("zero-shot-classification")
-
         # Keywords for categorization
         self.admin_keywords = [
             "admin",
@@ -53,6 +62,22 @@ class ReleaseNotesAnalyzer:
             "migration",
         ]
 
+        # Build a single Aho-Corasick automaton over all keyword sets so each
+        # note is scanned once, in native code, regardless of keyword count.
+        categories_by_keyword: Dict[str, Set[str]] = {}
+        for category, keywords in (
+            ("admin", self.admin_keywords),
+            ("user", self.user_keywords),
+            ("compatibility", self.compatibility_keywords),
+        ):
+            for keyword in keywords:
+                categories_by_keyword.setdefault(keyword.lower(), set()).add(category)
+
+        self._keyword_automaton = ahocorasick.Automaton()
+        for keyword, categories in categories_by_keyword.items():
+            self._keyword_automaton.add_word(keyword, frozenset(categories))
+        self._keyword_automaton.make_automaton()
+
     def analyze_release_notes(
         self,
         release_notes: List[Dict[str, Any]],
@@ -70,92 +95,94 @@ class ReleaseNotesAnalyzer:
         Returns:
             Dictionary containing categorized release notes
         """
-        admin_notes = []
-        user_notes = []
-        compatibility_warnings = []
+        admin_hits = []
+        user_hits = []
+        # Dict keys dedupe repeated warnings while keeping first-seen order
+        compatibility_warnings: Dict[str, None] = {}
+
+        # Parse the target version once; every regex match compares against it
+        target_parsed = self._parse_version(target_jira_version)
 
         for note in release_notes:
             version = note["version"]
             content = note["notes"]
+            # Lowercase once per note; every check below reuses this copy
+            content_lower = content.lower()
 
             # Check for compatibility issues
             compatibility_issues = self._check_compatibility(
-                content, current_jira_version, target_jira_version
+                content_lower, target_parsed
             )
             if compatibility_issues:
-                compatibility_warnings.extend(compatibility_issues)
+                compatibility_warnings.update(
+                    (issue, None) for issue in compatibility_issues
+                )
 
-            # Categorize the note
-            if self._is_admin_relevant(content):
-                admin_notes.append(f"**Version {version}:**\n{content}")
-            if self._is_user_relevant(content):
-                user_notes.append(f"**Version {version}:**\n{content}")
+            # Categorize the note; formatting is deferred to the final join
+            categories = self._classify(content_lower)
+            if "admin" in categories:
+                admin_hits.append((version, content))
+            if "user" in categories:
+                user_hits.append((version, content))
 
         return {
-            "admin_notes": "\n\n".join(admin_notes)
-            if admin_notes
+            "admin_notes": self._render_notes(admin_hits)
+            if admin_hits
             else "No admin-relevant changes found.",
-            "user_notes": "\n\n".join(user_notes)
-            if user_notes
+            "user_notes": self._render_notes(user_hits)
+            if user_hits
             else "No user-relevant changes found.",
             "compatibility_warnings": "\n\n".join(compatibility_warnings)
             if compatibility_warnings
             else "",
         }
 
-    def _is_admin_relevant(self, content: str) -> bool:
-        """Check if content is relevant for administrators."""
-        return any(
-            keyword.lower() in content.lower() for keyword in self.admin_keywords
+    @staticmethod
+    def _render_notes(hits: List[Tuple[str, str]]) -> str:
+        """Format matched (version, content) pairs in a single join pass."""
+        return "\n\n".join(
+            f"**Version {version}:**\n{content}" for version, content in hits
         )
 
-    def _is_user_relevant(self, content: str) -> bool:
-        """Check if content is relevant for end users."""
-        return any(keyword.lower() in content.lower() for keyword in self.user_keywords)
+    def _classify(self, content_lower: str) -> Set[str]:
+        """Match all category keywords in a single pass over the content."""
+        matched: Set[str] = set()
+        for _, categories in self._keyword_automaton.iter(content_lower):
+            matched |= categories
+            if len(matched) == 3:
+                break
+        return matched
 
     def _check_compatibility(
-        self, content: str, current_jira_version: str, target_jira_version: str
+        self, content_lower: str, target_parsed: Tuple[int, ...]
     ) -> List[str]:
         """Check for compatibility issues in the content."""
         warnings = []
 
         # Look for version requirements
-        version_pattern = r"requires\s+Jira\s+(\d+\.\d+\.\d+)"
-        matches = re.finditer(version_pattern, content, re.IGNORECASE)
-
-        for match in matches:
+        for match in _VERSION_RE.finditer(content_lower):
             required_version = match.group(1)
-            if self._compare_versions(required_version, target_jira_version) > 0:
+            required = self._parse_version(required_version)
+            # Pad to equal length so e.g. "9.4" == "9.4.0"
+            n = max(len(required), len(target_parsed))
+            if required + (0,) * (n - len(required)) > target_parsed + (0,) * (
+                n - len(target_parsed)
+            ):
                 warnings.append(
                     f"⚠️ Warning: This version requires Jira {required_version} or higher"
                 )
 
         # Look for breaking changes
-        if "breaking change" in content.lower():
+        if "breaking change" in content_lower:
             warnings.append("⚠️ Warning: Contains breaking changes")
 
         # Look for deprecation notices
-        if "deprecated" in content.lower():
+        if "deprecated" in content_lower:
             warnings.append("⚠️ Warning: Contains deprecated features")
 
         return warnings
 
-    def _compare_versions(self, v1: str, v2: str) -> int:
-        """Compare two version strings."""
-
-        def parse_version(v: str) -> List[int]:
-            return [int(x) for x in v.split(".")]
-
-        v1_parts = parse_version(v1)
-        v2_parts = parse_version(v2)
-
-        for i in range(max(len(v1_parts), len(v2_parts))):
-            v1_part = v1_parts[i] if i < len(v1_parts) else 0
-            v2_part = v2_parts[i] if i < len(v2_parts) else 0
-
-            if v1_part > v2_part:
-                return 1
-            elif v1_part < v2_part:
-                return -1
-
-        return 0
+    @staticmethod
+    def _parse_version(v: str) -> Tuple[int, ...]:
+        """Parse a dotted version string into a tuple of ints."""
+        return tuple(map(int, v.split(".")))
@@ -9,25 +9,108 @@ st.set_page_config(
 
 import json
 from typing import List, Dict, Any
-import PyPDF2
-import io
 import requests
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 import re
 import os
+import time
+import hashlib
+import diskcache
+import tiktoken
 from openai import OpenAI
 from models import PluginAnalysis, ReleaseNote, ChangeType, Importance
 from dotenv import load_dotenv
 from fpdf import FPDF
 from datetime import datetime
+from collections import defaultdict
+
+try:
+    # Optional: RE2 gives linear-time matching on large scraped inputs
+    import re2 as _regex
+except ImportError:
+    _regex = re
+
+# Precompiled pattern for pulling version numbers out of analysis bullets
+_VERSION_RE = _regex.compile(r'Version[s]?\s+([\d\., ]+(?:through|and)\s+[\d\.]+|[\d\.]+)')
+
+# Tokenizes the model's markdown reply in one pass: main section headers,
+# subsection headers, and bullet lines. Flags go inline as (?m) because
+# RE2's compile() does not take stdlib flag arguments.
+_RESP_RE = _regex.compile(
+    r'(?m)^\s*(?P<section>Admin Changes|User Changes|Compatibility Warnings):\s*$'
+    r'|^\s*(?P<sub>[A-Z][A-Za-z ]+):\s*$'
+    r'|^\s*•\s*(?P<bullet>.+?)\s*$'
+)
+
+_SECTION_KEYS = {
+    'Admin Changes': 'admin',
+    'User Changes': 'user',
+    'Compatibility Warnings': 'compatibility',
+}
+
+# Words that mark a bullet as a major change
+_MAJOR_WORDS = frozenset({'security', 'vulnerability', 'breaking', 'compatibility', 'critical'})
+
+# Persistent cache of parsed analysis results, keyed by prompt content hash,
+# so re-running an identical analysis skips the API call entirely
+_LLM_CACHE = diskcache.Cache("./.llm_cache")
+
+# Shared HTTP session: keeps TCP/TLS connections alive across URLs and
+# across Streamlit reruns instead of handshaking per request
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": "jira-plugin-analyzer"})
 
 # Initialize environment and OpenAI client
 load_dotenv(override=True)
 api_key = os.getenv('OPENAI_API_KEY')
 
+
+@st.cache_resource
+def get_openai_client(key: str) -> OpenAI:
+    """Create the OpenAI client once per process instead of on every rerun."""
+    return OpenAI(api_key=key)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_and_clean(url: str) -> str:
+    """Download a release-notes page and return its visible text."""
+    # Imported lazily: only submissions with URLs pay for the parser import
+    from selectolax.parser import HTMLParser
+
+    response = SESSION.get(url, timeout=15)
+    response.raise_for_status()
+    tree = HTMLParser(response.text)
+    # Drop non-content subtrees in a single native pass
+    tree.strip_tags(["script", "style", "noscript"])
+    body = tree.body if tree.body is not None else tree.root
+    return body.text(separator="\n")
+
+
+def _iter_pdf_pages(pdf):
+    """Yield extracted text page by page, releasing each page eagerly.
+
+    PDFium keeps native buffers alive for every open page and textpage;
+    closing them as soon as their text is copied out keeps peak memory at
+    one page instead of the whole document.
+    """
+    for page in pdf:
+        textpage = page.get_textpage()
+        try:
+            yield textpage.get_text_range()
+        finally:
+            textpage.close()
+            page.close()
+
+
+@st.cache_data
+def _working_directory() -> str:
+    """One-shot lookup so the debug panel skips the syscall on reruns."""
+    return os.getcwd()
+
+
 # Debug information in expandable section
 with st.expander("Debug Information", expanded=False):
-    st.write(f"Current working directory: {os.getcwd()}")
+    st.write(f"Current working directory: {_working_directory()}")
     st.write("Checking OpenAI API key...")
     if not api_key:
         st.error("OpenAI API key not found in environment variables.")
@@ -37,7 +120,7 @@ with st.expander("Debug Information", expanded=False):
         st.success("OpenAI API key found!")
 
     try:
-        client = OpenAI(api_key=api_key)
+        client = get_openai_client(api_key)
         st.success("OpenAI client initialized successfully!")
     except Exception as e:
         st.error(f"Error initializing OpenAI client: {str(e)}")
@@ -95,139 +178,337 @@ Compatibility Warnings:
 
 Follow this example format but adapt it to the specific content of the release notes being analyzed."""
 
-USER_PROMPT_TEMPLATE = """Analyze these release notes and provide a structured summary:
+# The static instructions come first and the variable release-notes text goes
+# last, so the longest possible prefix (system prompt + instructions) stays
+# byte-identical across calls and OpenAI's server-side prompt cache can reuse it
+USER_PROMPT_TEMPLATE = """Analyze these release notes and provide a structured summary following exactly the same format as shown in the system prompt example. Focus on the most important changes between the current and target versions, with special attention to compatibility issues and breaking changes.
 
 Current Jira Version: {current_version}
 Target Jira Version: {target_version}
 Plugin: {plugin_name}
 
 Release Notes:
-{release_notes}
-
-Analyze the release notes and provide a summary following exactly the same format as shown in the system prompt example. Focus on the most important changes between the current and target versions, with special attention to compatibility issues and breaking changes."""
+{release_notes}"""
+
+def _parse_analysis(analysis_text: str) -> Dict[str, Any]:
+    """Parse the model's markdown reply into category-grouped results."""
+    # User and admin changes arrive pre-grouped by category so the
+    # display/export paths never have to regroup them
+    results = {
+        'user': defaultdict(list),
+        'admin': defaultdict(list),
+        'compatibility': []
+    }
 
-def analyze_with_openai(text: str, plugin_name: str, current_version: str, target_version: str) -> Dict[str, List[Dict[str, Any]]]:
-    """Use OpenAI to analyze the release notes."""
+    # Tokenize the reply in a single compiled-regex pass
+    current_main_section = None
+    current_subsection = None
+
+    for match in _RESP_RE.finditer(analysis_text):
+        section = match.group('section')
+        if section:
+            current_main_section = _SECTION_KEYS[section]
+            current_subsection = None
+            continue
+
+        subsection = match.group('sub')
+        if subsection:
+            current_subsection = subsection
+            continue
+
+        content = match.group('bullet')
+
+        # Extract version if present
+        version_match = _VERSION_RE.search(content)
+        version = version_match.group(1) if version_match else 'N/A'
+
+        # Determine importance based on content and section
+        content_lower = content.lower()
+        importance = 'major' if any(word in content_lower for word in _MAJOR_WORDS) else 'minor'
+
+        if current_main_section == 'compatibility':
+            results['compatibility'].append({
+                'text': content
+            })
+        elif current_main_section:
+            results[current_main_section][current_subsection or 'General'].append({
+                'importance': importance,
+                'text': content,
+                'version': version,
+            })
+
+    return results
+
+
+@st.cache_data(ttl=86400, max_entries=256, show_spinner=False)
+def _analyze_cached(text: str, plugin_name: str, current_version: str, target_version: str, model: str):
+    """Call OpenAI and parse the reply.
+
+    Pure in its arguments so Streamlit can memoize repeat analyses within a
+    session; the disk cache persists hits across sessions.
+    """
+    user_prompt = USER_PROMPT_TEMPLATE.format(
+        current_version=current_version,
+        target_version=target_version,
+        plugin_name=plugin_name,
+        release_notes=text
+    )
+
+    # Serve identical prompts from the disk cache instead of the API
+    cache_key = hashlib.sha256(
+        (model + SYSTEM_PROMPT + user_prompt).encode()
+    ).hexdigest()
+    cached = _LLM_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Call OpenAI API, streaming so partial output renders while the
+    # model is still generating instead of blocking on the full reply
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ],
+        temperature=0.0,
+        # The prompt caps each category at 5-7 items, so 1200 tokens is
+        # plenty and bounds worst-case generation latency
+        max_tokens=1200,
+        stream=True,
+        # Ask for usage on the final chunk; streams omit it by default,
+        # which would leave the sidebar token report empty
+        stream_options={"include_usage": True}
+    )
+
+    placeholder = st.empty()
+    parts = []
+    usage = None
+    pending_chars = 0
+    last_render = 0.0
+    for chunk in response:
+        if chunk.choices:
+            delta = chunk.choices[0].delta.content or ""
+            if delta:
+                parts.append(delta)
+                pending_chars += len(delta)
+                # Coalesce updates: re-rendering per token floods the
+                # frontend with websocket frames and markdown re-parses
+                now = time.monotonic()
+                if pending_chars >= 64 and now - last_render >= 0.05:
+                    placeholder.markdown("".join(parts))
+                    pending_chars = 0
+                    last_render = now
+        # The final chunk carries usage stats when the API reports them
+        usage = getattr(chunk, "usage", None) or usage
+
+    analysis_text = "".join(parts)
+    placeholder.empty()
+
+    if usage:
+        prompt_details = getattr(usage, 'prompt_tokens_details', None)
+        usage_dict = {
+            'prompt_tokens': usage.prompt_tokens,
+            'completion_tokens': usage.completion_tokens,
+            'total_tokens': usage.total_tokens,
+            'cached_tokens': getattr(prompt_details, 'cached_tokens', 0) or 0,
+        }
+    else:
+        usage_dict = None
+
+    results = _parse_analysis(analysis_text)
+
+    # Store the parsed results so cache hits skip parsing too
+    _LLM_CACHE.set(cache_key, (results, usage_dict))
+
+    return results, usage_dict
+
+
+# Inputs above this size get chunked, analyzed per chunk with the cheap
+# model, and merged with a final reduce call
+_MAX_SINGLE_PROMPT_CHARS = 24000
+
+# Release-note section boundary: a line starting with "Version X.Y[.Z]"
+_CHUNK_BOUNDARY_RE = _regex.compile(r'(?m)^Version\s+\d[\d.]*')
+
+
+def _split_release_notes(text: str, max_chars: int = _MAX_SINGLE_PROMPT_CHARS) -> List[str]:
+    """Split text at version-heading boundaries into chunks under max_chars."""
+    starts = [m.start() for m in _CHUNK_BOUNDARY_RE.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts = [0] + starts
+    sections = [text[s:e] for s, e in zip(starts, starts[1:] + [len(text)])]
+
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for section in sections:
+        if current and size + len(section) > max_chars:
+            chunks.append("".join(current))
+            current, size = [], 0
+        current.append(section)
+        size += len(section)
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+@st.cache_data(ttl=86400, max_entries=512, show_spinner=False)
+def _chunk_summary(chunk: str, plugin_name: str, current_version: str, target_version: str) -> str:
+    """Map step: analyze one chunk with the cheap model, returning raw markdown.
+
+    Cached per chunk, so changing one source URL doesn't re-analyze the
+    unchanged ones.
+    """
+    user_prompt = USER_PROMPT_TEMPLATE.format(
+        current_version=current_version,
+        target_version=target_version,
+        plugin_name=plugin_name,
+        release_notes=chunk
+    )
+    response = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ],
+        temperature=0.0,
+        max_tokens=1200,
+    )
+    return response.choices[0].message.content
+
+
+def _map_reduce_analyze(text: str, plugin_name: str, current_version: str, target_version: str, model: str):
+    """Chunk an oversized input, map with gpt-4o-mini, reduce with the
+    selected model through the normal cached analysis path."""
+    chunks = _split_release_notes(text)
+    st.info(f"Large input: analyzing {len(chunks)} chunks, then merging...")
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        summaries = list(executor.map(
+            lambda chunk: _chunk_summary(chunk, plugin_name, current_version, target_version),
+            chunks,
+        ))
+    return _analyze_cached("\n\n".join(summaries), plugin_name, current_version, target_version, model)
+
+
+@st.cache_resource
+def _token_encoder(model: str):
+    """BPE encoder for exact token counts, cached per model."""
     try:
-        # Prepare the prompt
-        user_prompt = USER_PROMPT_TEMPLATE.format(
-            current_version=current_version,
-            target_version=target_version,
-            plugin_name=plugin_name,
-            release_notes=text
-        )
-
-        # Get the selected model
-        model = st.session_state.get('openai_model', 'gpt-3.5-turbo')
-        
-        # Show which model is being used
-        st.sidebar.markdown("---")
-        st.sidebar.markdown("### Current Analysis")
-        st.sidebar.info(f"🤖 Using model: {model}")
-        
-        # Add token estimation
-        approx_tokens = len(text.split()) + len(SYSTEM_PROMPT.split()) + len(user_prompt.split())
-        estimated_cost = (
-            "$0.0015 per 1K tokens" if model == "gpt-3.5-turbo" 
-            else "$0.01-0.03 per 1K tokens"
-        )
-        st.sidebar.text(f"Estimated tokens: ~{approx_tokens}")
-        st.sidebar.text(f"Estimated cost: {estimated_cost}")
-
-        # Call OpenAI API
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+@st.cache_data(show_spinner=False)
+def _static_prompt_tokens(model: str) -> int:
+    """Token count of the constant prompt parts, computed once per model."""
+    encoder = _token_encoder(model)
+    return len(encoder.encode(SYSTEM_PROMPT)) + len(encoder.encode(USER_PROMPT_TEMPLATE))
+
+
+def submit_batch_analysis(text: str, plugin_name: str, current_version: str, target_version: str, model: str) -> str:
+    """Submit the analysis through the OpenAI Batch API.
+
+    Same model and tokens at half the price, for runs that can wait up to
+    24 hours instead of needing an interactive answer.
+    """
+    import io
+
+    user_prompt = USER_PROMPT_TEMPLATE.format(
+        current_version=current_version,
+        target_version=target_version,
+        plugin_name=plugin_name,
+        release_notes=text
+    )
+    line = {
+        "custom_id": plugin_name or "unknown-plugin",
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": model,
+            "messages": [
                 {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": user_prompt}
             ],
-            temperature=0.0,
-            max_tokens=2000
-        )
+            "temperature": 0.0,
+            "max_tokens": 1200,
+        },
+    }
+    payload = io.BytesIO(json.dumps(line).encode() + b"\n")
+    batch_file = client.files.create(file=("batch.jsonl", payload), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    return batch.id
+
+
+def check_batch_results(batch_id: str):
+    """Poll a submitted batch; return parsed results once it has completed."""
+    batch = client.batches.retrieve(batch_id)
+    if batch.status != "completed":
+        st.info(f"Batch status: {batch.status}")
+        return None
+
+    output = client.files.content(batch.output_file_id)
+    results = None
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        data = json.loads(line)
+        content = data["response"]["body"]["choices"][0]["message"]["content"]
+        results = _parse_analysis(content)
+    return results
 
-        # Show actual tokens used
-        input_tokens = response.usage.prompt_tokens
-        output_tokens = response.usage.completion_tokens
-        total_tokens = response.usage.total_tokens
-        
-        st.sidebar.text(f"Actual tokens used:")
-        st.sidebar.text(f"  Input: {input_tokens}")
-        st.sidebar.text(f"  Output: {output_tokens}")
-        st.sidebar.text(f"  Total: {total_tokens}")
 
-        # Parse the response
-        analysis_text = response.choices[0].message.content
-        
-        results = {
-            'user': [],
-            'admin': [],
-            'compatibility': []
-        }
-        
-        # Split into main sections
-        sections = analysis_text.split('\n\n')
-        current_main_section = None
-        current_subsection = None
-        
-        for section in sections:
-            if not section.strip():
-                continue
-                
-            lines = section.strip().split('\n')
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                # Check for main sections
-                if line == 'Admin Changes:':
-                    current_main_section = 'admin'
-                    current_subsection = None
-                elif line == 'User Changes:':
-                    current_main_section = 'user'
-                    current_subsection = None
-                elif line == 'Compatibility Warnings:':
-                    current_main_section = 'compatibility'
-                    current_subsection = None
-                # Check for subsections
-                elif line.endswith(':'):
-                    current_subsection = line[:-1]  # Remove the colon
-                # Process actual content
-                elif line.startswith('•'):
-                    content = line[2:].strip()  # Remove bullet point
-                    
-                    # Extract version if present
-                    version_match = re.search(r'Version[s]?\s+([\d\., ]+(?:through|and)\s+[\d\.]+|[\d\.]+)', content)
-                    version = version_match.group(1) if version_match else 'N/A'
-                    
-                    # Determine importance based on content and section
-                    importance = 'major' if any(word in content.lower() for word in 
-                        ['security', 'vulnerability', 'breaking', 'compatibility', 'critical']) else 'minor'
-                    
-                    if current_main_section == 'compatibility':
-                        results['compatibility'].append({
-                            'text': content
-                        })
-                    else:
-                        item = {
-                            'importance': importance,
-                            'text': content,
-                            'version': version,
-                            'category': current_subsection or 'General'
-                        }
-                        if current_main_section:
-                            results[current_main_section].append(item)
-        
-        return results
-        
+def analyze_with_openai(text: str, plugin_name: str, current_version: str, target_version: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Use OpenAI to analyze the release notes. Thin UI wrapper: all the
+    Streamlit sidebar output lives here so the analysis itself stays
+    cacheable."""
+    model = st.session_state.get('openai_model', 'gpt-4o-mini')
+
+    # Show which model is being used
+    st.sidebar.markdown("---")
+    st.sidebar.markdown("### Current Analysis")
+    st.sidebar.info(f"🤖 Using model: {model}")
+
+    # Add token estimation (real BPE counts; whitespace splitting was off by
+    # 30-50% and materialized a throwaway word list over the whole input)
+    approx_tokens = _static_prompt_tokens(model) + len(_token_encoder(model).encode(text))
+    estimated_cost = (
+        "$0.00015 per 1K tokens" if model == "gpt-4o-mini"
+        else "$0.0015 per 1K tokens" if model == "gpt-3.5-turbo"
+        else "$0.01-0.03 per 1K tokens"
+    )
+    st.sidebar.text(f"Estimated tokens: ~{approx_tokens}")
+    st.sidebar.text(f"Estimated cost: {estimated_cost}")
+
+    try:
+        if len(text) > _MAX_SINGLE_PROMPT_CHARS:
+            results, usage = _map_reduce_analyze(text, plugin_name, current_version, target_version, model)
+        else:
+            results, usage = _analyze_cached(text, plugin_name, current_version, target_version, model)
     except Exception as e:
         st.error(f"Error analyzing release notes with OpenAI: {str(e)}")
         return {
-            'user': [],
-            'admin': [],
+            'user': defaultdict(list),
+            'admin': defaultdict(list),
             'compatibility': []
         }
 
+    # Show actual tokens used when available
+    if usage:
+        st.sidebar.text("Actual tokens used:")
+        st.sidebar.text(f"  Input: {usage['prompt_tokens']}")
+        st.sidebar.text(f"  Output: {usage['completion_tokens']}")
+        st.sidebar.text(f"  Total: {usage['total_tokens']}")
+        # Cached prefix tokens are billed at a fraction of the base rate
+        if usage.get('cached_tokens'):
+            st.sidebar.text(f"  Cached (prefix): {usage['cached_tokens']}")
+
+    return results
+
 def importance_badge(importance: str) -> str:
     """Create an HTML-styled badge for importance level."""
     colors = {
@@ -243,71 +524,115 @@ def importance_badge(importance: str) -> str:
         margin-right: 0.5rem;
     ">{importance}</span>"""
 
+# Only two importance levels exist, so render each badge exactly once at
+# import time instead of per bullet
+_BADGE_HTML = {
+    'major': importance_badge('major'),
+    'minor': importance_badge('minor'),
+}
+_IMPORTANCE_DOT = {'major': '🔴', 'minor': '🟡'}
+
+# Styling for the results table, injected once per script run from main()
+_CSS = """
+    <style>
+    .analysis-header {
+        color: #6B778C;
+        font-size: 1.1rem;
+        margin-bottom: 1rem;
+    }
+    .change-item {
+        margin-bottom: 0.8rem;
+    }
+    .subsection-header {
+        color: #172B4D;
+        font-size: 1rem;
+        margin: 1rem 0 0.5rem 0;
+        font-weight: 500;
+    }
+    </style>
+    """
+
+
 def warning_text(text: str) -> str:
     """Format warning text in red."""
     return f'<span style="color: #FF5630">{text}</span>'
 
 def generate_markdown(results: Dict[str, Any], plugin_name: str, current_version: str, target_version: str) -> str:
     """Generate a markdown report from the analysis results."""
-    markdown = f"# {plugin_name} Release Notes Analysis\n\n"
-    markdown += f"Analysis from version {current_version} to {target_version}\n"
-    markdown += f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+    # Collect fragments and join once: repeated += reallocates the whole
+    # report string on every append
+    parts = [
+        f"# {plugin_name} Release Notes Analysis\n\n",
+        f"Analysis from version {current_version} to {target_version}\n",
+        f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n",
+    ]
 
     # Add User Changes
-    markdown += "## 👤 User Changes\n\n"
-    user_changes_by_category = {}
-    for change in results['user']:
-        category = change.get('category', 'General')
-        if category not in user_changes_by_category:
-            user_changes_by_category[category] = []
-        user_changes_by_category[category].append(change)
-    
-    for category, changes in user_changes_by_category.items():
+    parts.append("## 👤 User Changes\n\n")
+    for category, changes in results['user'].items():
         if category != 'General':
-            markdown += f"### {category}\n\n"
+            parts.append(f"### {category}\n\n")
         for change in changes:
-            importance = "🔴" if change["importance"] == "major" else "🟡"
-            markdown += f"{importance} {change['text']}\n\n"
+            parts.append(f"{_IMPORTANCE_DOT.get(change['importance'], '🟡')} {change['text']}\n\n")
 
     # Add Admin Changes
-    markdown += "## ⚙️ Admin Changes\n\n"
-    admin_changes_by_category = {}
-    for change in results['admin']:
-        category = change.get('category', 'General')
-        if category not in admin_changes_by_category:
-            admin_changes_by_category[category] = []
-        admin_changes_by_category[category].append(change)
-    
-    for category, changes in admin_changes_by_category.items():
+    parts.append("## ⚙️ Admin Changes\n\n")
+    for category, changes in results['admin'].items():
         if category != 'General':
-            markdown += f"### {category}\n\n"
+            parts.append(f"### {category}\n\n")
         for change in changes:
-            importance = "🔴" if change["importance"] == "major" else "🟡"
-            markdown += f"{importance} {change['text']}\n\n"
+            parts.append(f"{_IMPORTANCE_DOT.get(change['importance'], '🟡')} {change['text']}\n\n")
 
     # Add Compatibility Warnings
     if results['compatibility']:
-        markdown += "## ⚠️ Compatibility Warnings\n\n"
+        parts.append("## ⚠️ Compatibility Warnings\n\n")
         for warning in results['compatibility']:
-            markdown += f"- ⚠️ {warning['text']}\n\n"
+            parts.append(f"- ⚠️ {warning['text']}\n\n")
+
+    return "".join(parts)
+
+# Candidate TTF locations: a repo-local bundle first, then common install
+# paths on Linux and macOS
+_FONT_CANDIDATES = (
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts", "DejaVuSans.ttf"),
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/System/Library/Fonts/Supplemental/Arial Unicode.ttf",
+)
+
+
+@st.cache_resource
+def _resolve_font_path():
+    """Locate a Unicode-capable TTF once per process.
+
+    Returns None when no candidate exists, in which case PDF export falls
+    back to the built-in core fonts.
+    """
+    for path in _FONT_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    return None
 
-    return markdown
 
 def generate_pdf(results: Dict[str, Any], plugin_name: str, current_version: str, target_version: str) -> bytes:
     """Generate a PDF report from the analysis results."""
     pdf = FPDF()
     pdf.add_page()
-    
+
     # Set up fonts and margins
     pdf.set_left_margin(15)
     pdf.set_right_margin(15)
-    pdf.add_font('DejaVu', '', '/System/Library/Fonts/Supplemental/Arial Unicode.ttf', uni=True)
-    pdf.set_font('DejaVu', '', 12)
-    
+    font_path = _resolve_font_path()
+    if font_path:
+        pdf.add_font('DejaVu', '', font_path, uni=True)
+        font_family = 'DejaVu'
+    else:
+        font_family = 'Helvetica'
+    pdf.set_font(font_family, '', 12)
+
     # Title
-    pdf.set_font('DejaVu', '', 16)
+    pdf.set_font(font_family, '', 16)
     pdf.cell(0, 10, f"{plugin_name} Release Notes Analysis", ln=True)
-    pdf.set_font('DejaVu', '', 10)
+    pdf.set_font(font_family, '', 10)
     pdf.cell(0, 10, f"Analysis from version {current_version} to {target_version}", ln=True)
     pdf.cell(0, 10, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True)
     pdf.ln(10)
@@ -326,44 +651,30 @@ def generate_pdf(results: Dict[str, Any], plugin_name: str, current_version: str
         pdf.ln(3)
 
     # User Changes
-    pdf.set_font('DejaVu', '', 14)
+    pdf.set_font(font_family, '', 14)
     pdf.cell(0, 10, "User Changes", ln=True)
     pdf.ln(5)
-    
-    user_changes_by_category = {}
-    for change in results['user']:
-        category = change.get('category', 'General')
-        if category not in user_changes_by_category:
-            user_changes_by_category[category] = []
-        user_changes_by_category[category].append(change)
-    
-    for category, changes in user_changes_by_category.items():
+
+    for category, changes in results['user'].items():
         if category != 'General':
-            pdf.set_font('DejaVu', '', 12)
+            pdf.set_font(font_family, '', 12)
             pdf.cell(0, 10, category, ln=True)
-        pdf.set_font('DejaVu', '', 10)
+        pdf.set_font(font_family, '', 10)
         for change in changes:
             write_change(change['text'], change['importance'])
         pdf.ln(5)
 
     # Admin Changes
     pdf.add_page()
-    pdf.set_font('DejaVu', '', 14)
+    pdf.set_font(font_family, '', 14)
     pdf.cell(0, 10, "Admin Changes", ln=True)
     pdf.ln(5)
-    
-    admin_changes_by_category = {}
-    for change in results['admin']:
-        category = change.get('category', 'General')
-        if category not in admin_changes_by_category:
-            admin_changes_by_category[category] = []
-        admin_changes_by_category[category].append(change)
-    
-    for category, changes in admin_changes_by_category.items():
+
+    for category, changes in results['admin'].items():
         if category != 'General':
-            pdf.set_font('DejaVu', '', 12)
+            pdf.set_font(font_family, '', 12)
             pdf.cell(0, 10, category, ln=True)
-        pdf.set_font('DejaVu', '', 10)
+        pdf.set_font(font_family, '', 10)
         for change in changes:
             write_change(change['text'], change['importance'])
         pdf.ln(5)
@@ -371,10 +682,10 @@ def generate_pdf(results: Dict[str, Any], plugin_name: str, current_version: str
     # Compatibility Warnings
     if results['compatibility']:
         pdf.add_page()
-        pdf.set_font('DejaVu', '', 14)
+        pdf.set_font(font_family, '', 14)
         pdf.cell(0, 10, "Compatibility Warnings", ln=True)
         pdf.ln(5)
-        pdf.set_font('DejaVu', '', 10)
+        pdf.set_font(font_family, '', 10)
         
         for warning in results['compatibility']:
             write_change(warning['text'])
@@ -413,96 +724,59 @@ def display_analysis_results(results: Dict[str, Any], plugin_name: str, current_
                 use_container_width=True
             )
 
-    # Create three columns for the table
-    st.markdown("""
-    <style>
-    .analysis-header {
-        color: #6B778C;
-        font-size: 1.1rem;
-        margin-bottom: 1rem;
-    }
-    .change-item {
-        margin-bottom: 0.8rem;
-    }
-    .subsection-header {
-        color: #172B4D;
-        font-size: 1rem;
-        margin: 1rem 0 0.5rem 0;
-        font-weight: 500;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-    
+    def column_html(header: str, grouped) -> str:
+        parts = [f'<p class="analysis-header">{header}</p>']
+        for category, changes in grouped.items():
+            if category != 'General':
+                parts.append(f'<p class="subsection-header">{category}</p>')
+            for change in changes:
+                badge = _BADGE_HTML.get(change["importance"].lower(), _BADGE_HTML['minor'])
+                parts.append(
+                    f'<div class="change-item">{badge}{change["text"]}</div>'
+                )
+        return "".join(parts)
+
     cols = st.columns([4, 4, 4])
-    
-    # Headers
-    cols[0].markdown('<p class="analysis-header">👤 User Changes</p>', unsafe_allow_html=True)
-    cols[1].markdown('<p class="analysis-header">⚙️ Admin Changes</p>', unsafe_allow_html=True)
-    cols[2].markdown('<p class="analysis-header">⚠️ Compatibility Warnings</p>', unsafe_allow_html=True)
-    
-    # Group user changes by category
-    user_changes_by_category = {}
-    for change in results['user']:
-        category = change.get('category', 'General')
-        if category not in user_changes_by_category:
-            user_changes_by_category[category] = []
-        user_changes_by_category[category].append(change)
-    
-    # Display User Changes
-    for category, changes in user_changes_by_category.items():
-        if category != 'General':
-            cols[0].markdown(f'<p class="subsection-header">{category}</p>', unsafe_allow_html=True)
-        for change in changes:
-            cols[0].markdown(
-                f'<div class="change-item">{importance_badge(change["importance"])}{change["text"]}</div>', 
-                unsafe_allow_html=True
-            )
-    
-    # Group admin changes by category
-    admin_changes_by_category = {}
-    for change in results['admin']:
-        category = change.get('category', 'General')
-        if category not in admin_changes_by_category:
-            admin_changes_by_category[category] = []
-        admin_changes_by_category[category].append(change)
-    
-    # Display Admin Changes
-    for category, changes in admin_changes_by_category.items():
-        if category != 'General':
-            cols[1].markdown(f'<p class="subsection-header">{category}</p>', unsafe_allow_html=True)
-        for change in changes:
-            cols[1].markdown(
-                f'<div class="change-item">{importance_badge(change["importance"])}{change["text"]}</div>', 
-                unsafe_allow_html=True
-            )
-    
-    # Display Compatibility Warnings
-    for warning in results['compatibility']:
-        cols[2].markdown(
-            f'<div class="change-item">{warning_text(warning["text"])}</div>', 
-            unsafe_allow_html=True
-        )
+
+    # One markdown call per column: every st.markdown costs a websocket
+    # frame and a frontend markdown parse, so batch each column's HTML
+    cols[0].markdown(column_html('👤 User Changes', results['user']), unsafe_allow_html=True)
+    cols[1].markdown(column_html('⚙️ Admin Changes', results['admin']), unsafe_allow_html=True)
+
+    warning_parts = ['<p class="analysis-header">⚠️ Compatibility Warnings</p>']
+    warning_parts.extend(
+        f'<div class="change-item">{warning_text(warning["text"])}</div>'
+        for warning in results['compatibility']
+    )
+    cols[2].markdown("".join(warning_parts), unsafe_allow_html=True)
 
 def main():
     st.title("🚀 Jira Plugin Release Notes Analyzer")
     st.markdown("Analyze plugin release notes efficiently before upgrading Jira Data Center.")
+    st.markdown(_CSS, unsafe_allow_html=True)
 
     # Add model selection in sidebar
     with st.sidebar:
         st.header("Settings")
         model = st.selectbox(
             "Select OpenAI Model",
-            options=['gpt-3.5-turbo', 'gpt-4-turbo-preview'],
+            options=['gpt-4o-mini', 'gpt-3.5-turbo', 'gpt-4-turbo-preview'],
             index=0,
-            help="GPT-3.5 is more cost-effective, while GPT-4 may provide more detailed analysis"
+            help="gpt-4o-mini is the fastest and cheapest option, while GPT-4 may provide more detailed analysis"
         )
         st.session_state['openai_model'] = model
-        
-        if model == 'gpt-3.5-turbo':
-            st.info("💰 Using GPT-3.5-turbo for cost-effective analysis")
+
+        if model in ('gpt-4o-mini', 'gpt-3.5-turbo'):
+            st.info(f"💰 Using {model} for cost-effective analysis")
         else:
             st.warning("💎 Using GPT-4 for premium analysis (higher cost)")
 
+        st.session_state['batch_mode'] = st.checkbox(
+            "Offline batch (24 h, 50% off)",
+            value=st.session_state.get('batch_mode', False),
+            help="Submit via the OpenAI Batch API instead of analyzing immediately"
+        )
+
     # Jira Version Inputs
     col1, col2 = st.columns(2)
     with col1:
@@ -535,46 +809,128 @@ def main():
     # Process the inputs when form is submitted
     if submitted:
         st.info("Processing release notes...")
-        
-        all_text = ""
-        
+
+        # Collect per-source chunks and join once at the end, instead of
+        # growing a single string with repeated concatenation
+        all_text_parts: List[str] = []
+
         # Process URLs
         urls = [url for url in [url1, url2, url3] if url]
         if urls:
-            for url in urls:
+            # Fetch all URLs concurrently; repeat submissions of the same URL
+            # hit the fetch_and_clean cache instead of the network
+            with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+                futures = {url: executor.submit(fetch_and_clean, url) for url in urls}
+
+            for url, future in futures.items():
                 try:
-                    response = requests.get(url)
-                    response.raise_for_status()
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    # Remove script and style elements
-                    for script in soup(["script", "style"]):
-                        script.decompose()
-                    all_text += soup.get_text() + "\n\n"
+                    all_text_parts.append(future.result())
                 except Exception as e:
                     st.error(f"Error fetching URL {url}: {str(e)}")
         
         # Process PDF if uploaded
         if uploaded_file:
             try:
-                pdf_reader = PyPDF2.PdfReader(io.BytesIO(uploaded_file.read()))
-                for page in pdf_reader.pages:
-                    all_text += page.extract_text() + "\n\n"
+                # Imported lazily: only PDF submissions pay for the bindings
+                import pypdfium2 as pdfium
+
+                # PDFium extracts text in native code and streams from the
+                # file object, so the upload is never duplicated in memory
+                pdf = pdfium.PdfDocument(uploaded_file)
+                skipped_pages = 0
+                try:
+                    for text in _iter_pdf_pages(pdf):
+                        # Pages with almost no extractable text are likely
+                        # scans; shipping their whitespace still bills tokens
+                        if len(text.strip()) < 40:
+                            skipped_pages += 1
+                            continue
+                        all_text_parts.append(text)
+                finally:
+                    pdf.close()
+                if skipped_pages:
+                    with st.expander("Debug: PDF extraction", expanded=False):
+                        st.write(
+                            f"Skipped {skipped_pages} page(s) with little or no "
+                            "extractable text (likely scanned images)."
+                        )
             except Exception as e:
                 st.error(f"Error processing PDF: {str(e)}")
-        
+
+        # Deduplicate repeated paragraphs across sources before the LLM sees
+        # them; copy-pasted changelog entries otherwise bill tokens twice
+        seen_paragraphs: set = set()
+        deduped_parts: List[str] = []
+        total_paragraphs = 0
+        for part in all_text_parts:
+            kept = []
+            for paragraph in part.split("\n\n"):
+                total_paragraphs += 1
+                key = hash(paragraph.strip().lower())
+                if key in seen_paragraphs:
+                    continue
+                seen_paragraphs.add(key)
+                kept.append(paragraph)
+            if kept:
+                deduped_parts.append("\n\n".join(kept))
+
+        if total_paragraphs > len(seen_paragraphs):
+            with st.expander("Debug: deduplication", expanded=False):
+                st.write(
+                    f"Kept {len(seen_paragraphs)} of {total_paragraphs} paragraphs "
+                    f"({total_paragraphs - len(seen_paragraphs)} duplicates removed)."
+                )
+
+        all_text = "\n\n".join(deduped_parts)
+
         if all_text:
-            # Analyze the content using OpenAI
-            results = analyze_with_openai(
-                all_text,
-                plugin_name or "Unknown Plugin",
-                current_jira_version,
-                target_jira_version
-            )
-            
-            # Display results in the new format
-            display_analysis_results(results, plugin_name or "Unknown Plugin", current_jira_version, target_jira_version)
+            if st.session_state.get('batch_mode'):
+                # Queue the analysis through the Batch API at half price
+                try:
+                    batch_id = submit_batch_analysis(
+                        all_text,
+                        plugin_name or "Unknown Plugin",
+                        current_jira_version,
+                        target_jira_version,
+                        st.session_state.get('openai_model', 'gpt-4o-mini')
+                    )
+                    st.session_state['batch_id'] = batch_id
+                    st.session_state['batch_meta'] = (
+                        plugin_name or "Unknown Plugin",
+                        current_jira_version,
+                        target_jira_version,
+                    )
+                    st.success(f"Batch submitted (id: {batch_id}). Results arrive within 24 hours.")
+                except Exception as e:
+                    st.error(f"Error submitting batch: {str(e)}")
+            else:
+                # Analyze the content using OpenAI
+                results = analyze_with_openai(
+                    all_text,
+                    plugin_name or "Unknown Plugin",
+                    current_jira_version,
+                    target_jira_version
+                )
+
+                # Display results in the new format
+                display_analysis_results(results, plugin_name or "Unknown Plugin", current_jira_version, target_jira_version)
         else:
             st.warning("No content to analyze. Please provide either URLs or a PDF file.")
 
+    # Poll a previously submitted offline batch
+    if st.session_state.get('batch_id'):
+        st.markdown("---")
+        st.subheader("Offline Batch")
+        st.text(f"Batch ID: {st.session_state['batch_id']}")
+        if st.button("Check batch results"):
+            try:
+                results = check_batch_results(st.session_state['batch_id'])
+            except Exception as e:
+                st.error(f"Error retrieving batch: {str(e)}")
+                results = None
+            if results is not None:
+                batch_plugin, batch_cur, batch_tgt = st.session_state['batch_meta']
+                display_analysis_results(results, batch_plugin, batch_cur, batch_tgt)
+
 if __name__ == "__main__":
     main()
@@ -7,34 +7,76 @@ st.set_page_config(
     layout="wide"
 )
 
+import hashlib
 import json
-from typing import List, Dict, Any
-import PyPDF2
-import io
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Set
 import requests
-from bs4 import BeautifulSoup
 import re
 import os
 from datetime import datetime
 from fpdf import FPDF
 import ollama
 
-# Debug information in expandable section
-with st.expander("Debug Information", expanded=False):
-    st.write(f"Current working directory: {os.getcwd()}")
-    st.write("Checking Ollama connection...")
+@st.cache_resource(show_spinner="Warming up Ollama...")
+def get_ollama_client(model: str):
+    """Check the Ollama connection once and keep the model loaded.
+
+    Runs a throwaway exchange with keep_alive so the model stays resident
+    in Ollama's memory; without it every analysis after an idle period pays
+    the multi-second model reload. Cached per model, so reruns skip both
+    the connectivity probe and the warm-up.
+    """
+    available = ollama.list()
+    ollama.chat(
+        model=model,
+        messages=[{"role": "user", "content": "warmup"}],
+        keep_alive="1h",
+    )
+    return available
+
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """Shared session so TCP and TLS handshakes are reused across URLs."""
+    return requests.Session()
+
+
+@st.cache_data(ttl=3600)
+def fetch_url_text(url: str) -> str:
+    """Download a release-notes page and return its visible text.
+
+    Cached for an hour so re-analyzing the same URL skips the network
+    round-trip and the HTML parse; only the extracted text is stored.
+    """
+    # Imported lazily: only submissions with URLs pay for the parser import
+    from selectolax.parser import HTMLParser
+
+    response = get_http_session().get(url, timeout=10)
+    response.raise_for_status()
+    tree = HTMLParser(response.text)
+    # Drop non-content subtrees in a single native pass
+    tree.strip_tags(["script", "style", "noscript"])
+    body = tree.body if tree.body is not None else tree.root
+    return body.text(separator="\n")
+
+
+@st.cache_data(show_spinner=False)
+def extract_pdf_text(file_bytes: bytes) -> str:
+    """Extract text from an uploaded PDF, cached per file content.
+
+    Streamlit keys the cache on a hash of the bytes, so re-submitting the
+    same upload skips the extraction entirely.
+    """
+    # Imported lazily: only PDF submissions pay for the bindings
+    import fitz
+
+    doc = fitz.open(stream=file_bytes, filetype="pdf")
     try:
-        # Test Ollama connection
-        response = ollama.list()
-        st.success("Ollama connection successful!")
-        if 'models' in response:
-            st.write("Available models:", [model.get('name', 'Unknown') for model in response['models']])
-        else:
-            st.write("No models found. Please pull a model using: ollama pull mistral")
-    except Exception as e:
-        st.error(f"Error connecting to Ollama: {str(e)}")
-        st.error("Please ensure Ollama is running and accessible")
-        st.stop()
+        return "\n\n".join(page.get_text("text") for page in doc)
+    finally:
+        doc.close()
 
 SYSTEM_PROMPT = """You are a Jira plugin release notes analyzer. Your task is to analyze release notes and provide a concise, structured summary of the most important changes between the specified version range.
 
@@ -101,154 +143,435 @@ Release Notes:
 
 Analyze the release notes and provide a summary following exactly the same format as shown in the system prompt example. Focus on the most important changes between the current and target versions, with special attention to compatibility issues and breaking changes."""
 
-def analyze_with_ollama(text: str, plugin_name: str, current_version: str, target_version: str) -> Dict[str, List[Dict[str, Any]]]:
-    """Use Ollama to analyze the release notes."""
+# Section parsing is a single compiled pass over the response instead of
+# per-section substring checks and string surgery. Headings may carry
+# trailing words (the prompt's "Compatibility Issues and Breaking Changes"),
+# so the pattern allows extra text before the colon; a section ends at the
+# next line that starts with a letter (bullets start with * or -).
+SECTION_RE = re.compile(
+    r'(?ms)^(New Features|Bugs Fixed|Breaking Changes|Compatibility Issues'
+    r'|Other Noteworthy Changes)[^\n]*:\s*\n(.*?)(?=^[A-Za-z]|\Z)'
+)
+
+# Bullet lines: one match extracts the content without the marker or
+# edge whitespace, replacing a strip/startswith/strip chain per line
+BULLET_RE = re.compile(r'^\s*[*-]\s*(.+?)\s*$')
+
+# Importance keyword alternations, one C-level search per bullet
+MAJOR_FEATURE_RE = re.compile(r'breaking change|deprecation|security|critical|important', re.I)
+MAJOR_BUGFIX_RE = re.compile(r'security|critical|important|fix', re.I)
+MAJOR_ADMIN_RE = re.compile(r'security|critical|important|update', re.I)
+
+# Heading -> (results bucket, display category, major-keyword pattern);
+# None for the pattern means every bullet in the section is major
+SECTION_DISPATCH = {
+    'New Features': ('user', 'New Features', MAJOR_FEATURE_RE),
+    'Bugs Fixed': ('user', 'Bug Fixes', MAJOR_BUGFIX_RE),
+    'Breaking Changes': ('admin', 'Breaking Changes', None),
+    'Compatibility Issues': ('compatibility', None, None),
+    'Other Noteworthy Changes': ('admin', 'Other Changes', MAJOR_ADMIN_RE),
+}
+
+
+# Appended to the system prompt when JSON mode is on; format="json"
+# constrains generation so this parses with one json.loads call
+JSON_FORMAT_INSTRUCTIONS = """
+
+Return the analysis as a single JSON object instead of markdown, with exactly
+this shape:
+{"new_features": [], "bugs_fixed": [], "breaking_changes": [],
+ "compatibility_issues": [], "other_changes": []}
+Each array element is one change description string. Return only the JSON
+object, no surrounding text."""
+
+# JSON-mode keys route through the same dispatch table as the headings
+_JSON_KEY_TO_SECTION = {
+    'new_features': 'New Features',
+    'bugs_fixed': 'Bugs Fixed',
+    'breaking_changes': 'Breaking Changes',
+    'compatibility_issues': 'Compatibility Issues',
+    'other_changes': 'Other Noteworthy Changes',
+}
+
+
+_NORM_RE = re.compile(r'\W+')
+
+
+def _dedupe_key(content: str) -> str:
+    """Normalized form used to drop bullets repeated across sections."""
+    return _NORM_RE.sub(' ', content.lower()).strip()
+
+
+def _empty_results() -> Dict[str, Any]:
+    """Fresh results container: changes grouped by category at parse time."""
+    return {
+        'user': defaultdict(list),
+        'admin': defaultdict(list),
+        'compatibility': []
+    }
+
+
+def _dispatch_section(section: str, results: Dict[str, Any], seen: Set[str]) -> None:
+    """Parse one completed response section into the grouped results.
+
+    ``seen`` holds normalized bullet keys for the whole analysis, so a
+    change the model repeats under two headings lands only once.
+    """
+    for match in SECTION_RE.finditer(section):
+        bucket, category, major_re = SECTION_DISPATCH[match.group(1)]
+        for item in match.group(2).splitlines():
+            m = BULLET_RE.match(item)
+            if not m:
+                continue
+            content = m.group(1)
+            if content.lower() == 'none specified in the provided release notes.':
+                continue
+            key = _dedupe_key(content)
+            if key in seen:
+                continue
+            seen.add(key)
+            if bucket == 'compatibility':
+                results['compatibility'].append({
+                    'text': content
+                })
+                continue
+            # Determine importance based on content
+            importance = 'major' if major_re is None or major_re.search(content) else 'minor'
+            results[bucket][category].append({
+                'importance': importance,
+                'text': content,
+                'version': 'N/A'
+            })
+
+
+def _map_json_response(data: Dict[str, Any], results: Dict[str, Any], seen: Set[str]) -> None:
+    """Map a JSON-mode response into the grouped results."""
+    for key, heading in _JSON_KEY_TO_SECTION.items():
+        bucket, category, major_re = SECTION_DISPATCH[heading]
+        for content in data.get(key, []):
+            if not isinstance(content, str) or not content.strip():
+                continue
+            content = content.strip()
+            norm = _dedupe_key(content)
+            if norm in seen:
+                continue
+            seen.add(norm)
+            if bucket == 'compatibility':
+                results['compatibility'].append({
+                    'text': content
+                })
+                continue
+            importance = 'major' if major_re is None or major_re.search(content) else 'minor'
+            results[bucket][category].append({
+                'importance': importance,
+                'text': content,
+                'version': 'N/A'
+            })
+
+
+def _render_partial(results: Dict[str, Any]) -> str:
+    """Compact progress line shown while the response streams in."""
+    return (
+        f"Analyzing... {sum(map(len, results['user'].values()))} user, "
+        f"{sum(map(len, results['admin'].values()))} admin and "
+        f"{len(results['compatibility'])} compatibility item(s) so far"
+    )
+
+
+# Lines mentioning a dotted version number mark chunk boundaries for the
+# version-range pre-filter
+_VERSION_HEADING_RE = re.compile(r'(?im)^.*?\b(\d+\.\d+(?:\.\d+)?)\b.*$')
+
+
+def _parse_version(v: str) -> tuple:
+    """Parse a dotted version string into a comparable tuple of ints."""
+    return tuple(map(int, v.split('.')))
+
+
+def _in_version_range(v: tuple, low: tuple, high: tuple) -> bool:
+    """Compare version tuples padded to equal length, so 9.4 == 9.4.0."""
+    n = max(len(v), len(low), len(high))
+    pad = (0,) * n
+    return (low + pad)[:n] <= (v + pad)[:n] <= (high + pad)[:n]
+
+
+def _filter_by_version_range(text: str, current_version: str, target_version: str) -> tuple:
+    """Drop release-note chunks for versions outside the upgrade range.
+
+    Prefill cost is linear in prompt length, so trimming versions outside
+    [current, target] shrinks inference time proportionally on large
+    scrapes. The bounds must be the plugin's own versions — the scale the
+    note headings use — never the Jira versions, which live on an
+    unrelated numbering. One neighbouring chunk is kept on either side of
+    each hit for context, and the full text is returned whenever the
+    versions don't parse or so little survives that the notes clearly
+    aren't organised by version headings.
+
+    Returns (filtered text, version labels of the dropped chunks) so the
+    caller can show what was cut.
+    """
     try:
-        # Prepare the prompt
-        user_prompt = USER_PROMPT_TEMPLATE.format(
-            current_version=current_version,
-            target_version=target_version,
-            plugin_name=plugin_name,
-            release_notes=text
+        low = _parse_version(current_version)
+        high = _parse_version(target_version)
+    except ValueError:
+        return text, []
+    if low > high:
+        low, high = high, low
+
+    matches = list(_VERSION_HEADING_RE.finditer(text))
+    if not matches:
+        return text, []
+
+    spans = [
+        (m.start(), matches[i + 1].start() if i + 1 < len(matches) else len(text), m.group(1))
+        for i, m in enumerate(matches)
+    ]
+    flags = [_in_version_range(_parse_version(ver), low, high) for _, _, ver in spans]
+    # Keep one neighbouring chunk of context on either side of each hit
+    keep = [
+        flag or (i > 0 and flags[i - 1]) or (i + 1 < len(flags) and flags[i + 1])
+        for i, flag in enumerate(flags)
+    ]
+
+    parts = [text[:spans[0][0]]]
+    parts += [text[start:end] for (start, end, _), kept in zip(spans, keep) if kept]
+    filtered = ''.join(parts)
+
+    if len(filtered.strip()) < 500:
+        return text, []
+    dropped = [ver for (_, _, ver), kept in zip(spans, keep) if not kept]
+    return filtered, dropped
+
+
+# Inputs larger than this are analyzed per chunk and merged; a local
+# model's prefill over one huge prompt can thrash or overflow the context
+_MAX_SINGLE_PROMPT_CHARS = 24000
+
+# Chunk boundaries: markdown headings or lines opening with a version number
+_CHUNK_BOUNDARY_RE = re.compile(r'(?m)^(?:#|\d+\.\d+)')
+
+
+def _chunk_by_heading(text: str, max_chars: int = _MAX_SINGLE_PROMPT_CHARS) -> List[str]:
+    """Split text at heading boundaries into chunks of at most max_chars.
+
+    Pieces pack greedily up to the cap; a single piece with no internal
+    boundary is kept whole rather than cut mid-sentence.
+    """
+    starts = [m.start() for m in _CHUNK_BOUNDARY_RE.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    pieces = [text[s:e] for s, e in zip(starts, starts[1:] + [len(text)])]
+
+    chunks: List[str] = []
+    buf: List[str] = []
+    size = 0
+    for piece in pieces:
+        if buf and size + len(piece) > max_chars:
+            chunks.append(''.join(buf))
+            buf, size = [], 0
+        buf.append(piece)
+        size += len(piece)
+    if buf:
+        chunks.append(''.join(buf))
+    return chunks
+
+
+def _merge_results(partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge per-chunk analyses, dropping bullets repeated across chunks."""
+    merged = _empty_results()
+    seen: Set[str] = set()
+    for partial in partials:
+        for bucket in ('user', 'admin'):
+            for category, changes in partial[bucket].items():
+                for change in changes:
+                    key = _dedupe_key(change['text'])
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    merged[bucket][category].append(change)
+        for warning in partial['compatibility']:
+            key = _dedupe_key(warning['text'])
+            if key in seen:
+                continue
+            seen.add(key)
+            merged['compatibility'].append(warning)
+    return merged
+
+
+@st.cache_data(ttl=24 * 3600, max_entries=512, show_spinner=False)
+def _analyze_chunk(chunk_hash: str, _chunk: str, model: str, plugin_name: str, current_version: str, target_version: str) -> Dict[str, Any]:
+    """Analyze one chunk of an oversized input, without UI side effects.
+
+    Runs inside worker threads during map-reduce, so unlike
+    _cached_llm_analyze it draws nothing; the caller merges and renders
+    the partials.
+    """
+    user_prompt = USER_PROMPT_TEMPLATE.format(
+        current_version=current_version,
+        target_version=target_version,
+        plugin_name=plugin_name,
+        release_notes=_chunk
+    )
+    response = ollama.chat(
+        model=model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+    )
+    results = _empty_results()
+    _dispatch_section(response['message']['content'], results, set())
+    return results
+
+
+@st.cache_data(ttl=24 * 3600, max_entries=256, show_spinner=False)
+def _cached_llm_analyze(text_hash: str, _text: str, model: str, plugin_name: str, current_version: str, target_version: str, json_mode: bool = False) -> Dict[str, Any]:
+    """Run the Ollama analysis and parse the response, memoized per input.
+
+    The cache key is the text's sha256 plus the model and version range;
+    ``_text`` carries the actual content past Streamlit's hasher so identical
+    resubmissions skip the multi-second inference and return the parsed dict.
+    """
+    # Prepare the prompt
+    user_prompt = USER_PROMPT_TEMPLATE.format(
+        current_version=current_version,
+        target_version=target_version,
+        plugin_name=plugin_name,
+        release_notes=_text
+    )
+
+    results = _empty_results()
+    # Normalized keys of every bullet kept so far, shared across sections
+    seen: Set[str] = set()
+    st.info("Calling Ollama API...")
+
+    if json_mode:
+        # Constrained generation returns one JSON object; a single
+        # json.loads replaces the whole section parser
+        response = ollama.chat(
+            model=model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT + JSON_FORMAT_INSTRUCTIONS},
+                {"role": "user", "content": user_prompt}
+            ],
+            format="json"
         )
+        analysis_text = response['message']['content']
+        try:
+            _map_json_response(json.loads(analysis_text), results, seen)
+        except (ValueError, AttributeError):
+            # Model strayed from the schema: the markdown parser is the
+            # fallback, in case it answered in the usual section format
+            _dispatch_section(analysis_text, results, seen)
+    else:
+        # Stream the response and dispatch each section as soon as its
+        # closing blank line arrives; the first results show up at
+        # first-token latency instead of after the full generation
+        placeholder = st.empty()
+        collected: List[str] = []
+        section_buf = ''
+        for chunk in ollama.chat(
+            model=model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ],
+            stream=True
+        ):
+            token = chunk['message']['content']
+            collected.append(token)
+            section_buf += token
+            if '\n\n' in section_buf:
+                *complete, section_buf = section_buf.split('\n\n')
+                for section in complete:
+                    _dispatch_section(section, results, seen)
+                placeholder.markdown(_render_partial(results))
+        # Flush whatever is left in the buffer (the last section has no
+        # trailing blank line)
+        if section_buf.strip():
+            _dispatch_section(section_buf, results, seen)
+        placeholder.empty()
+
+        analysis_text = ''.join(collected)
+
+    # Debug: Show parsed text
+    if st.session_state.get('debug_mode'):
+        with st.expander("Debug: Parsed Text", expanded=False):
+            st.code(analysis_text[:2000])
+
+    # Debug: Show final results
+    if st.session_state.get('debug_mode'):
+        with st.expander("Debug: Final Results", expanded=False):
+            st.write("Results:", results)
+
+    return results
 
+def analyze_with_ollama(text: str, plugin_name: str, current_version: str, target_version: str,
+                        plugin_current_version: str = '', plugin_target_version: str = '') -> Dict[str, Any]:
+    """Use Ollama to analyze the release notes.
+
+    ``current_version``/``target_version`` are the Jira versions that go
+    into the prompt; the optional plugin versions drive the pre-filter,
+    since release-note headings carry plugin version numbers.
+    """
+    try:
         # Get the selected model
         model = st.session_state.get('ollama_model', 'mistral')
-        
+
         # Show which model is being used
         st.sidebar.markdown("---")
         st.sidebar.markdown("### Current Analysis")
         st.sidebar.info(f"🤖 Using model: {model}")
-        
+
         # Debug information
-        with st.expander("Debug: Analysis Details", expanded=True):
-            st.write("Input text length:", len(text))
-            st.write("Model:", model)
-            st.write("Current version:", current_version)
-            st.write("Target version:", target_version)
-        
-        # Call Ollama API
-        st.info("Calling Ollama API...")
-        response = ollama.chat(
-            model=model,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt}
-            ]
+        if st.session_state.get('debug_mode'):
+            with st.expander("Debug: Analysis Details", expanded=True):
+                st.write("Input text length:", len(text))
+                st.write("Model:", model)
+                st.write("Current version:", current_version)
+                st.write("Target version:", target_version)
+
+        # Trim versions outside the upgrade range before paying for prefill.
+        # Keyed on the plugin's own versions, which is what the headings
+        # use; with the form's plugin version fields empty the filter is a
+        # no-op rather than cutting against the wrong scale.
+        text, dropped = _filter_by_version_range(
+            text, plugin_current_version, plugin_target_version
+        )
+        if dropped:
+            with st.expander("Debug: version filter", expanded=False):
+                st.write(
+                    f"Dropped {len(dropped)} chunk(s) with versions outside "
+                    f"{plugin_current_version} → {plugin_target_version}:",
+                    dropped
+                )
+
+        # Oversized inputs map per heading-aligned chunk, keeping each
+        # prefill bounded, and the structured partials merge afterwards
+        if len(text) > _MAX_SINGLE_PROMPT_CHARS:
+            chunks = _chunk_by_heading(text)
+            st.info(f"Large input: analyzing {len(chunks)} chunks...")
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                partials = list(executor.map(
+                    lambda chunk: _analyze_chunk(
+                        hashlib.sha256(chunk.encode()).hexdigest(), chunk,
+                        model, plugin_name, current_version, target_version
+                    ),
+                    chunks
+                ))
+            return _merge_results(partials)
+
+        # Identical resubmissions hit the cache instead of the model
+        text_hash = hashlib.sha256(text.encode()).hexdigest()
+        return _cached_llm_analyze(
+            text_hash, text, model, plugin_name, current_version, target_version,
+            json_mode=bool(st.session_state.get('json_mode'))
         )
-        
-        # Debug: Show raw response
-        with st.expander("Debug: Raw Response", expanded=True):
-            st.write("Response received:", response)
 
-        # Parse the response
-        analysis_text = response['message']['content']
-        
-        # Debug: Show parsed text
-        with st.expander("Debug: Parsed Text", expanded=True):
-            st.write("Analysis text:", analysis_text)
-        
-        results = {
-            'user': [],
-            'admin': [],
-            'compatibility': []
-        }
-        
-        # Split into sections
-        sections = analysis_text.split('\n\n')
-        current_section = None
-        
-        for section in sections:
-            if not section.strip():
-                continue
-            
-            # Check for section headers
-            if 'New Features' in section:
-                current_section = 'user'
-                items = section.replace('New Features:', '').strip().split('\n')
-                for item in items:
-                    if item.strip().startswith(('*', '-')):
-                        content = item.strip('*- ').strip()
-                        if content.lower() != 'none specified in the provided release notes.':
-                            # Determine importance based on content
-                            importance = 'major' if any(keyword in content.lower() for keyword in 
-                                ['breaking change', 'deprecation', 'security', 'critical', 'important']) else 'minor'
-                            results['user'].append({
-                                'importance': importance,
-                                'text': content,
-                                'version': 'N/A',
-                                'category': 'New Features'
-                            })
-            
-            elif 'Bugs Fixed' in section:
-                current_section = 'user'
-                items = section.replace('Bugs Fixed:', '').strip().split('\n')
-                for item in items:
-                    if item.strip().startswith(('*', '-')):
-                        content = item.strip('*- ').strip()
-                        # Determine importance based on content
-                        importance = 'major' if any(keyword in content.lower() for keyword in 
-                            ['security', 'critical', 'important', 'fix']) else 'minor'
-                        results['user'].append({
-                            'importance': importance,
-                            'text': content,
-                            'version': 'N/A',
-                            'category': 'Bug Fixes'
-                        })
-            
-            elif 'Breaking Changes' in section:
-                current_section = 'admin'
-                items = section.replace('Breaking Changes:', '').strip().split('\n')
-                for item in items:
-                    if item.strip().startswith(('*', '-')):
-                        content = item.strip('*- ').strip()
-                        results['admin'].append({
-                            'importance': 'major',
-                            'text': content,
-                            'version': 'N/A',
-                            'category': 'Breaking Changes'
-                        })
-            
-            elif 'Compatibility Issues' in section:
-                current_section = 'compatibility'
-                items = section.replace('Compatibility Issues:', '').strip().split('\n')
-                for item in items:
-                    if item.strip().startswith(('*', '-')):
-                        content = item.strip('*- ').strip()
-                        results['compatibility'].append({
-                            'text': content
-                        })
-            
-            elif 'Other Noteworthy Changes' in section:
-                current_section = 'admin'
-                items = section.replace('Other Noteworthy Changes:', '').strip().split('\n')
-                for item in items:
-                    if item.strip().startswith(('*', '-')):
-                        content = item.strip('*- ').strip()
-                        # Determine importance based on content
-                        importance = 'major' if any(keyword in content.lower() for keyword in 
-                            ['security', 'critical', 'important', 'update']) else 'minor'
-                        results['admin'].append({
-                            'importance': importance,
-                            'text': content,
-                            'version': 'N/A',
-                            'category': 'Other Changes'
-                        })
-        
-        # Debug: Show final results
-        with st.expander("Debug: Final Results", expanded=True):
-            st.write("Results:", results)
-        
-        return results
-        
     except Exception as e:
         st.error(f"Error analyzing release notes with Ollama: {str(e)}")
         st.error("Full error details:", exc_info=True)
-        return {
-            'user': [],
-            'admin': [],
-            'compatibility': []
-        }
+        return _empty_results()
 
 def importance_badge(importance: str) -> str:
     """Create an HTML-styled badge for importance level."""
@@ -269,67 +592,125 @@ def warning_text(text: str) -> str:
     """Format warning text in red."""
     return f'<span style="color: #FF5630">{text}</span>'
 
+# Badges only vary by level, so render each once at import
+_BADGE_HTML = {
+    'major': importance_badge('major'),
+    'minor': importance_badge('minor'),
+}
+_IMPORTANCE_DOT = {'major': '🔴', 'minor': '🟡'}
+
+# Styling for the results table, injected once per script run from main()
+_CSS = """
+    <style>
+    .analysis-header {
+        color: #6B778C;
+        font-size: 1.1rem;
+        margin-bottom: 1rem;
+    }
+    .change-item {
+        margin-bottom: 0.8rem;
+    }
+    .subsection-header {
+        color: #172B4D;
+        font-size: 1rem;
+        margin: 1rem 0 0.5rem 0;
+        font-weight: 500;
+    }
+    </style>
+    """
+
+
+def _render_column(header: str, grouped) -> str:
+    """Build one column's HTML in a single string for one markdown call."""
+    parts = [f'<p class="analysis-header">{header}</p>']
+    for category, changes in grouped.items():
+        if category != 'General':
+            parts.append(f'<p class="subsection-header">{category}</p>')
+        for change in changes:
+            badge = _BADGE_HTML.get(change["importance"].lower(), _BADGE_HTML['minor'])
+            parts.append(
+                f'<div class="change-item">{badge}{change["text"]}</div>'
+            )
+    return "".join(parts)
+
 def generate_markdown(results: Dict[str, Any], plugin_name: str, current_version: str, target_version: str) -> str:
     """Generate a markdown report from the analysis results."""
-    markdown = f"# {plugin_name} Release Notes Analysis\n\n"
-    markdown += f"Analysis from version {current_version} to {target_version}\n"
-    markdown += f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+    # Collect fragments and join once: += on a growing string is quadratic
+    parts = [
+        f"# {plugin_name} Release Notes Analysis\n\n",
+        f"Analysis from version {current_version} to {target_version}\n",
+        f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n",
+    ]
 
     # Add User Changes
-    markdown += "## 👤 User Changes\n\n"
-    user_changes_by_category = {}
-    for change in results['user']:
-        category = change.get('category', 'General')
-        if category not in user_changes_by_category:
-            user_changes_by_category[category] = []
-        user_changes_by_category[category].append(change)
-    
-    for category, changes in user_changes_by_category.items():
+    parts.append("## 👤 User Changes\n\n")
+    for category, changes in results['user'].items():
         if category != 'General':
-            markdown += f"### {category}\n\n"
+            parts.append(f"### {category}\n\n")
         for change in changes:
-            importance = "🔴" if change["importance"] == "major" else "🟡"
-            markdown += f"{importance} {change['text']}\n\n"
+            importance = _IMPORTANCE_DOT.get(change["importance"], _IMPORTANCE_DOT['minor'])
+            parts.append(f"{importance} {change['text']}\n\n")
 
     # Add Admin Changes
-    markdown += "## ⚙️ Admin Changes\n\n"
-    admin_changes_by_category = {}
-    for change in results['admin']:
-        category = change.get('category', 'General')
-        if category not in admin_changes_by_category:
-            admin_changes_by_category[category] = []
-        admin_changes_by_category[category].append(change)
-    
-    for category, changes in admin_changes_by_category.items():
+    parts.append("## ⚙️ Admin Changes\n\n")
+    for category, changes in results['admin'].items():
         if category != 'General':
-            markdown += f"### {category}\n\n"
+            parts.append(f"### {category}\n\n")
         for change in changes:
-            importance = "🔴" if change["importance"] == "major" else "🟡"
-            markdown += f"{importance} {change['text']}\n\n"
+            importance = _IMPORTANCE_DOT.get(change["importance"], _IMPORTANCE_DOT['minor'])
+            parts.append(f"{importance} {change['text']}\n\n")
 
     # Add Compatibility Warnings
     if results['compatibility']:
-        markdown += "## ⚠️ Compatibility Warnings\n\n"
-        for warning in results['compatibility']:
-            markdown += f"- ⚠️ {warning['text']}\n\n"
+        parts.append("## ⚠️ Compatibility Warnings\n\n")
+        parts.extend(f"- ⚠️ {warning['text']}\n\n" for warning in results['compatibility'])
 
-    return markdown
+    return "".join(parts)
 
+# Candidate TTF locations: a repo-local bundle first, then common install
+# paths on Linux and macOS
+_FONT_CANDIDATES = (
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts", "DejaVuSans.ttf"),
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/System/Library/Fonts/Supplemental/Arial Unicode.ttf",
+)
+
+
+@st.cache_resource
+def _resolve_font_path():
+    """Find a Unicode-capable TTF once per process, or None for core fonts."""
+    for path in _FONT_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+@st.cache_data(show_spinner=False)
 def generate_pdf(results: Dict[str, Any], plugin_name: str, current_version: str, target_version: str) -> bytes:
-    """Generate a PDF report from the analysis results."""
+    """Generate a PDF report from the analysis results.
+
+    Cached on the results content, so repeated export clicks for the same
+    analysis reuse the rendered bytes instead of re-parsing the font and
+    rebuilding the document.
+    """
     pdf = FPDF()
     pdf.add_page()
-    
+
     # Set up fonts and margins
     pdf.set_left_margin(15)
     pdf.set_right_margin(15)
-    pdf.add_font('DejaVu', '', '/System/Library/Fonts/Supplemental/Arial Unicode.ttf', uni=True)
-    pdf.set_font('DejaVu', '', 12)
-    
+    font_path = _resolve_font_path()
+    if font_path:
+        pdf.add_font('DejaVu', '', font_path, uni=True)
+        font_family = 'DejaVu'
+    else:
+        font_family = 'Helvetica'
+    pdf.set_font(font_family, '', 12)
+
     # Title
-    pdf.set_font('DejaVu', '', 16)
+    pdf.set_font(font_family, '', 16)
     pdf.cell(0, 10, f"{plugin_name} Release Notes Analysis", ln=True)
-    pdf.set_font('DejaVu', '', 10)
+    pdf.set_font(font_family, '', 10)
     pdf.cell(0, 10, f"Analysis from version {current_version} to {target_version}", ln=True)
     pdf.cell(0, 10, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True)
     pdf.ln(10)
@@ -348,44 +729,30 @@ def generate_pdf(results: Dict[str, Any], plugin_name: str, current_version: str
         pdf.ln(3)
 
     # User Changes
-    pdf.set_font('DejaVu', '', 14)
+    pdf.set_font(font_family, '', 14)
     pdf.cell(0, 10, "User Changes", ln=True)
     pdf.ln(5)
     
-    user_changes_by_category = {}
-    for change in results['user']:
-        category = change.get('category', 'General')
-        if category not in user_changes_by_category:
-            user_changes_by_category[category] = []
-        user_changes_by_category[category].append(change)
-    
-    for category, changes in user_changes_by_category.items():
+    for category, changes in results['user'].items():
         if category != 'General':
-            pdf.set_font('DejaVu', '', 12)
+            pdf.set_font(font_family, '', 12)
             pdf.cell(0, 10, category, ln=True)
-        pdf.set_font('DejaVu', '', 10)
+        pdf.set_font(font_family, '', 10)
         for change in changes:
             write_change(change['text'], change['importance'])
         pdf.ln(5)
 
     # Admin Changes
     pdf.add_page()
-    pdf.set_font('DejaVu', '', 14)
+    pdf.set_font(font_family, '', 14)
     pdf.cell(0, 10, "Admin Changes", ln=True)
     pdf.ln(5)
     
-    admin_changes_by_category = {}
-    for change in results['admin']:
-        category = change.get('category', 'General')
-        if category not in admin_changes_by_category:
-            admin_changes_by_category[category] = []
-        admin_changes_by_category[category].append(change)
-    
-    for category, changes in admin_changes_by_category.items():
+    for category, changes in results['admin'].items():
         if category != 'General':
-            pdf.set_font('DejaVu', '', 12)
+            pdf.set_font(font_family, '', 12)
             pdf.cell(0, 10, category, ln=True)
-        pdf.set_font('DejaVu', '', 10)
+        pdf.set_font(font_family, '', 10)
         for change in changes:
             write_change(change['text'], change['importance'])
         pdf.ln(5)
@@ -393,10 +760,10 @@ def generate_pdf(results: Dict[str, Any], plugin_name: str, current_version: str
     # Compatibility Warnings
     if results['compatibility']:
         pdf.add_page()
-        pdf.set_font('DejaVu', '', 14)
+        pdf.set_font(font_family, '', 14)
         pdf.cell(0, 10, "Compatibility Warnings", ln=True)
         pdf.ln(5)
-        pdf.set_font('DejaVu', '', 10)
+        pdf.set_font(font_family, '', 10)
         
         for warning in results['compatibility']:
             write_change(warning['text'])
@@ -435,79 +802,24 @@ def display_analysis_results(results: Dict[str, Any], plugin_name: str, current_
                 use_container_width=True
             )
 
-    # Create three columns for the table
-    st.markdown("""
-    <style>
-    .analysis-header {
-        color: #6B778C;
-        font-size: 1.1rem;
-        margin-bottom: 1rem;
-    }
-    .change-item {
-        margin-bottom: 0.8rem;
-    }
-    .subsection-header {
-        color: #172B4D;
-        font-size: 1rem;
-        margin: 1rem 0 0.5rem 0;
-        font-weight: 500;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-    
     cols = st.columns([4, 4, 4])
-    
-    # Headers
-    cols[0].markdown('<p class="analysis-header">👤 User Changes</p>', unsafe_allow_html=True)
-    cols[1].markdown('<p class="analysis-header">⚙️ Admin Changes</p>', unsafe_allow_html=True)
-    cols[2].markdown('<p class="analysis-header">⚠️ Compatibility Warnings</p>', unsafe_allow_html=True)
-    
-    # Group user changes by category
-    user_changes_by_category = {}
-    for change in results['user']:
-        category = change.get('category', 'General')
-        if category not in user_changes_by_category:
-            user_changes_by_category[category] = []
-        user_changes_by_category[category].append(change)
-    
-    # Display User Changes
-    for category, changes in user_changes_by_category.items():
-        if category != 'General':
-            cols[0].markdown(f'<p class="subsection-header">{category}</p>', unsafe_allow_html=True)
-        for change in changes:
-            cols[0].markdown(
-                f'<div class="change-item">{importance_badge(change["importance"])}{change["text"]}</div>', 
-                unsafe_allow_html=True
-            )
-    
-    # Group admin changes by category
-    admin_changes_by_category = {}
-    for change in results['admin']:
-        category = change.get('category', 'General')
-        if category not in admin_changes_by_category:
-            admin_changes_by_category[category] = []
-        admin_changes_by_category[category].append(change)
-    
-    # Display Admin Changes
-    for category, changes in admin_changes_by_category.items():
-        if category != 'General':
-            cols[1].markdown(f'<p class="subsection-header">{category}</p>', unsafe_allow_html=True)
-        for change in changes:
-            cols[1].markdown(
-                f'<div class="change-item">{importance_badge(change["importance"])}{change["text"]}</div>', 
-                unsafe_allow_html=True
-            )
-    
-    # Display Compatibility Warnings
-    for warning in results['compatibility']:
-        cols[2].markdown(
-            f'<div class="change-item">{warning_text(warning["text"])}</div>', 
-            unsafe_allow_html=True
-        )
+
+    # One markdown call per column: every st.markdown costs a websocket
+    # frame and a frontend markdown parse, so batch each column's HTML
+    cols[0].markdown(_render_column('👤 User Changes', results['user']), unsafe_allow_html=True)
+    cols[1].markdown(_render_column('⚙️ Admin Changes', results['admin']), unsafe_allow_html=True)
+
+    warning_parts = ['<p class="analysis-header">⚠️ Compatibility Warnings</p>']
+    warning_parts.extend(
+        f'<div class="change-item">{warning_text(warning["text"])}</div>'
+        for warning in results['compatibility']
+    )
+    cols[2].markdown("".join(warning_parts), unsafe_allow_html=True)
 
 def main():
     st.title("🚀 Jira Plugin Release Notes Analyzer (Local)")
     st.markdown("Analyze plugin release notes efficiently before upgrading Jira Data Center.")
+    st.markdown(_CSS, unsafe_allow_html=True)
 
     # Add model selection in sidebar
     with st.sidebar:
@@ -525,6 +837,32 @@ def main():
         else:
             st.info("🦙 Using Llama3.2 for general analysis")
 
+        # Constrained JSON output skips the markdown parser; off by default
+        # because it forgoes streaming progress
+        st.checkbox("Structured JSON output", key="json_mode", value=False)
+
+        # Debug panels serialize large payloads to the frontend; off by
+        # default so normal runs skip that cost
+        st.checkbox("Debug mode", key="debug_mode", value=False)
+
+    # Probe the connection and warm the model once per session
+    try:
+        available = get_ollama_client(model)
+    except Exception as e:
+        st.error(f"Error connecting to Ollama: {str(e)}")
+        st.error("Please ensure Ollama is running and accessible")
+        st.stop()
+
+    # Debug information in expandable section
+    if st.session_state.get('debug_mode'):
+        with st.expander("Debug Information", expanded=False):
+            st.write(f"Current working directory: {os.getcwd()}")
+            st.success("Ollama connection successful!")
+            if 'models' in available:
+                st.write("Available models:", [model.get('name', 'Unknown') for model in available['models']])
+            else:
+                st.write("No models found. Please pull a model using: ollama pull mistral")
+
     # Jira Version Inputs
     col1, col2 = st.columns(2)
     with col1:
@@ -558,31 +896,34 @@ def main():
     if submitted:
         st.info("Processing release notes...")
         
-        all_text = ""
-        
+        # Collected as (source name, text) pairs so the prompt can carry
+        # an explicit section per source
+        sources: List[tuple] = []
+
         # Process URLs
         urls = [url for url in [url1, url2, url3] if url]
         if urls:
-            for url in urls:
-                try:
-                    response = requests.get(url)
-                    response.raise_for_status()
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    # Remove script and style elements
-                    for script in soup(["script", "style"]):
-                        script.decompose()
-                    all_text += soup.get_text() + "\n\n"
-                except Exception as e:
-                    st.error(f"Error fetching URL {url}: {str(e)}")
-        
+            # Fetch concurrently: the wait is the slowest host, not the sum
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                futures = {executor.submit(fetch_url_text, url): url for url in urls}
+                for future, url in futures.items():
+                    try:
+                        sources.append((url, future.result()))
+                    except Exception as e:
+                        st.error(f"Error fetching URL {url}: {str(e)}")
+
         # Process PDF if uploaded
         if uploaded_file:
             try:
-                pdf_reader = PyPDF2.PdfReader(io.BytesIO(uploaded_file.read()))
-                for page in pdf_reader.pages:
-                    all_text += page.extract_text() + "\n\n"
+                sources.append((uploaded_file.name, extract_pdf_text(uploaded_file.read())))
             except Exception as e:
                 st.error(f"Error processing PDF: {str(e)}")
+
+        # Labelled sections keep the sources distinguishable to the model
+        # instead of one undifferentiated blob
+        all_text = "\n\n".join(
+            f"### Source: {name}\n{text}" for name, text in sources
+        )
         
         if all_text:
             # Analyze the content using Ollama
@@ -590,7 +931,9 @@ def main():
                 all_text,
                 plugin_name or "Unknown Plugin",
                 current_jira_version,
-                target_jira_version
+                target_jira_version,
+                plugin_current_version=current_version,
+                plugin_target_version=target_version
             )
             
             # Display results in the new format
@@ -1,4 +1,7 @@
-from pydantic import BaseModel, Field
+import hashlib
+from functools import cached_property
+
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional
 from enum import Enum
 
@@ -25,8 +28,7 @@ class ReleaseNote(BaseModel):
     importance: Importance
     compatibility_warnings: Optional[List[str]] = []
 
-    class Config:
-        allow_population_by_field_name = True
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class PluginAnalysis(BaseModel):
@@ -38,8 +40,16 @@ class PluginAnalysis(BaseModel):
     user_notes: List[ReleaseNote] = []
     compatibility_warnings: List[str] = []
 
-    class Config:
-        allow_population_by_field_name = True
+    model_config = ConfigDict(populate_by_name=True)
+
+    def cache_key(self) -> str:
+        """Deterministic digest of the analysis, usable as a memoization key."""
+        return hashlib.sha256(self.model_dump_json().encode()).hexdigest()
+
+    @cached_property
+    def pretty_dict(self) -> dict:
+        """The pretty formatted dictionary, materialized once per instance."""
+        return self.to_pretty_dict()
 
     def to_pretty_dict(self) -> dict:
         """Convert the analysis to a pretty formatted dictionary."""